@@ -1,10 +1,16 @@
 import os
+import re
 import logging
 import asyncio
-from datetime import datetime
+import time
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timezone
 from telegram import Update
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
+from telegram.constants import ParseMode
+from telegram.helpers import escape_markdown
+from telegram.ext import Application, ChatMemberHandler, CommandHandler, MessageHandler, filters, ContextTypes
 from supabase import create_client, Client
+from supabase.lib.client_options import ClientOptions
 
 # ================= НАСТРОЙКА =================
 logging.basicConfig(
@@ -18,6 +24,11 @@ SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_KEY = os.getenv('SUPABASE_KEY')
 BOT_TOKEN = os.getenv('BOT_TOKEN')
 
+# Таймаут запросов к Supabase, секунд
+SUPABASE_TIMEOUT = 10
+# Сколько обновлений Telegram обрабатываются одновременно
+CONCURRENT_UPDATES = 32
+
 # Проверка переменных
 if not all([SUPABASE_URL, SUPABASE_KEY, BOT_TOKEN]):
     missing = []
@@ -29,63 +40,169 @@ if not all([SUPABASE_URL, SUPABASE_KEY, BOT_TOKEN]):
 
 # Инициализация Supabase клиента
 try:
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    # Клиент один на весь процесс: его httpx-сессия держит соединения
+    # открытыми (keep-alive), и TLS не переустанавливается на каждый запрос
+    supabase: Client = create_client(
+        SUPABASE_URL,
+        SUPABASE_KEY,
+        options=ClientOptions(postgrest_client_timeout=SUPABASE_TIMEOUT)
+    )
     logger.info("✅ Supabase клиент инициализирован")
 except Exception as e:
     logger.error(f"❌ Ошибка инициализации Supabase: {e}")
     exit(1)
 
+# ================= КЭШ =================
+NICK_CACHE_TTL = 300        # секунд
+NO_NICK_CACHE_TTL = 60      # для пользователей без ника храним меньше
+NICK_CACHE_MAX_SIZE = 10000
+STATS_CACHE_TTL = 10        # секунд
+NICK_WRITE_RETRIES = 3      # попыток записи ника в базу
+NICK_WRITE_BACKOFF = 1      # пауза перед повтором, секунд; удваивается
+
+# telegram_id -> ({'game_nick', 'created_at'} или None, время записи);
+# порядок ключей = порядок LRU
+_nick_cache: OrderedDict[int, tuple[dict | None, float]] = OrderedDict()
+
+def _cache_get_user(telegram_id: int) -> tuple[bool, dict | None]:
+    """Достать пользователя из кэша: (найден ли свежий, данные)"""
+    entry = _nick_cache.get(telegram_id)
+    if entry is None:
+        return False, None
+    
+    user, cached_at = entry
+    ttl = NICK_CACHE_TTL if user is not None else NO_NICK_CACHE_TTL
+    if time.monotonic() - cached_at > ttl:
+        del _nick_cache[telegram_id]
+        return False, None
+    
+    _nick_cache.move_to_end(telegram_id)
+    return True, user
+
+def _cache_set_user(telegram_id: int, user: dict | None):
+    """Положить пользователя в кэш, вытесняя самые старые записи"""
+    _nick_cache[telegram_id] = (user, time.monotonic())
+    _nick_cache.move_to_end(telegram_id)
+    while len(_nick_cache) > NICK_CACHE_MAX_SIZE:
+        _nick_cache.popitem(last=False)
+
+# (статистика, время записи)
+_stats_cache: tuple[dict, float] | None = None
+
+# Очередь записи ников в базу, разбирается фоновой задачей nick_writer
+_write_queue: asyncio.Queue = asyncio.Queue()
+
+# ================= НАГРУЗКА В ГРУППАХ =================
+CHAT_QUEUE_THRESHOLD = 2     # после скольких ожидающих показываем "обрабатываю"
+REMINDER_TTL = 15            # через сколько секунд удалять напоминание о нике
+
+# chat_id -> блокировка: сообщения одного чата обрабатываются по порядку
+_chat_locks: defaultdict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+# chat_id -> сколько сообщений в обработке и в очереди
+_chat_pending: defaultdict[int, int] = defaultdict(int)
+# chat_id -> задача отправки уведомления о нагрузке
+_busy_notices: dict[int, asyncio.Task] = {}
+
 # ================= БАЗА ДАННЫХ =================
+async def run_query(query):
+    """Выполнить запрос Supabase в отдельном потоке, не блокируя event loop"""
+    return await asyncio.to_thread(query.execute)
+
 class DatabaseManager:
     """Менеджер для работы с Supabase"""
     
     @staticmethod
-    async def get_user_nick(telegram_id: int) -> str:
-        """Получить ник пользователя"""
+    async def get_user(telegram_id: int) -> dict | None:
+        """Получить ник и дату регистрации пользователя"""
+        found, user = _cache_get_user(telegram_id)
+        if found:
+            return user
+        
         try:
-            response = supabase.table('users') \
-                .select('game_nick') \
-                .eq('telegram_id', telegram_id) \
-                .execute()
+            # Не maybe_single(): в postgrest-py 0.13 отсутствие строки может
+            # прийти исключением, и пустой результат не попал бы в кэш
+            response = await run_query(supabase.table('users')
+                .select('game_nick, created_at')
+                .eq('telegram_id', telegram_id)
+                .limit(1))
             
-            if response.data and len(response.data) > 0:
-                return response.data[0]['game_nick']
-            return None
+            user = response.data[0] if response.data else None
+            
+            _cache_set_user(telegram_id, user)
+            return user
         except Exception as e:
             logger.error(f"❌ Ошибка получения ника: {e}")
             return None
     
     @staticmethod
-    async def save_user_nick(telegram_id: int, username: str, name: str, game_nick: str) -> bool:
-        """Сохранить или обновить ник пользователя"""
+    async def get_user_nick(telegram_id: int) -> str:
+        """Получить ник пользователя"""
+        user = await DatabaseManager.get_user(telegram_id)
+        return user['game_nick'] if user else None
+    
+    @staticmethod
+    async def prefetch_nicks(telegram_ids: list[int]):
+        """Загрузить в кэш ники сразу нескольких пользователей одним запросом"""
+        ids = [tid for tid in telegram_ids if not _cache_get_user(tid)[0]]
+        if not ids:
+            return
+        
         try:
-            # Проверяем существующего пользователя
-            existing = supabase.table('users') \
-                .select('telegram_id') \
-                .eq('telegram_id', telegram_id) \
-                .execute()
+            response = await run_query(supabase.table('users')
+                .select('telegram_id, game_nick, created_at')
+                .in_('telegram_id', ids))
             
-            user_data = {
-                'telegram_id': telegram_id,
-                'telegram_username': username,
-                'telegram_name': name,
-                'game_nick': game_nick,
-                'updated_at': datetime.now().isoformat()
-            }
+            found = {row['telegram_id']: row for row in response.data or []}
+            for tid in ids:
+                row = found.get(tid)
+                _cache_set_user(tid, {
+                    'game_nick': row['game_nick'],
+                    'created_at': row['created_at']
+                } if row else None)
+            logger.info(f"📥 Загружено в кэш ников: {len(found)} из {len(ids)}")
+        except Exception as e:
+            logger.error(f"❌ Ошибка загрузки ников: {e}")
+    
+    @staticmethod
+    async def save_user_nick(telegram_id: int, username: str, name: str, game_nick: str):
+        """Сохранить или обновить ник пользователя (запись в базу - в фоне)"""
+        user_data = {
+            'telegram_id': telegram_id,
+            'telegram_username': username,
+            'telegram_name': name,
+            'game_nick': game_nick,
+            'updated_at': datetime.now(timezone.utc).isoformat()
+        }
+        
+        # Ник сразу доступен из кэша, а в Supabase его запишет nick_writer.
+        # Дату регистрации нового пользователя узнаем после записи
+        _, cached = _cache_get_user(telegram_id)
+        created_at = cached['created_at'] if cached else None
+        _cache_set_user(telegram_id, {'game_nick': game_nick, 'created_at': created_at})
+        _write_queue.put_nowait(user_data)
+    
+    @staticmethod
+    async def write_user_nick(user_data: dict) -> bool:
+        """Записать ник пользователя в Supabase"""
+        global _stats_cache
+        telegram_id = user_data['telegram_id']
+        try:
+            # Один запрос вместо проверки + update/insert;
+            # created_at заполняется DEFAULT now() на стороне базы
+            response = await run_query(supabase.table('users')
+                .upsert(user_data, on_conflict='telegram_id'))
+            logger.info(f"📝 Сохранен ник для {telegram_id}: {user_data['game_nick']}")
             
-            if existing.data and len(existing.data) > 0:
-                # Обновляем существующего
-                supabase.table('users') \
-                    .update(user_data) \
-                    .eq('telegram_id', telegram_id) \
-                    .execute()
-                logger.info(f"📝 Обновлен ник для {telegram_id}: {game_nick}")
-            else:
-                # Добавляем нового
-                user_data['created_at'] = datetime.now().isoformat()
-                supabase.table('users').insert(user_data).execute()
-                logger.info(f"✅ Добавлен новый пользователь {telegram_id}: {game_nick}")
+            # Подставляем в кэш дату регистрации, если ник с тех пор не меняли
+            _, cached = _cache_get_user(telegram_id)
+            if response.data and cached and cached['game_nick'] == user_data['game_nick']:
+                _cache_set_user(telegram_id, {
+                    'game_nick': user_data['game_nick'],
+                    'created_at': response.data[0].get('created_at')
+                })
             
+            # Мог появиться новый игрок - статистику пересчитаем при следующем запросе
+            _stats_cache = None
             return True
         except Exception as e:
             logger.error(f"❌ Ошибка сохранения ника: {e}")
@@ -94,44 +211,159 @@ class DatabaseManager:
     @staticmethod
     async def get_stats():
         """Получить статистику"""
+        global _stats_cache
+        if _stats_cache and time.monotonic() - _stats_cache[1] < STATS_CACHE_TTL:
+            return _stats_cache[0]
+        
         try:
-            response = supabase.table('users') \
-                .select('telegram_id', count='exact') \
-                .execute()
-            
-            total = response.count if hasattr(response, 'count') else len(response.data)
+            # Количество и последние игроки одним вызовом RPC
+            response = await run_query(supabase.rpc('get_user_stats', {}))
+            data = response.data or {}
             
-            # Получаем топ-5 последних пользователей
-            recent = supabase.table('users') \
-                .select('telegram_name, game_nick, created_at') \
-                .order('created_at', desc=True) \
-                .limit(5) \
-                .execute()
+            # Даты разбираем один раз на время жизни кэша, а не на каждый /stats
+            for user in data.get('recent') or []:
+                try:
+                    date_obj = datetime.fromisoformat(user['created_at'].replace('Z', '+00:00'))
+                    user['date_str'] = date_obj.strftime("%d.%m")
+                except:
+                    user['date_str'] = "сегодня"
             
-            return {
-                'total': total or 0,
-                'recent': recent.data if recent.data else []
+            stats = {
+                'total': data.get('total') or 0,
+                'recent': data.get('recent') or []
             }
+            _stats_cache = (stats, time.monotonic())
+            return stats
         except Exception as e:
             logger.error(f"❌ Ошибка получения статистики: {e}")
-            return {'total': 0, 'recent': []}
+            # total=None - число игроков неизвестно (база недоступна)
+            return {'total': None, 'recent': []}
     
     @staticmethod
     async def search_nick(search_text: str):
         """Поиск по нику или имени"""
         try:
-            response = supabase.table('users') \
-                .select('telegram_name, game_nick') \
-                .or_(f'game_nick.ilike.%{search_text}%,telegram_name.ilike.%{search_text}%') \
-                .limit(10) \
-                .execute()
+            # Поиск подстроки; ILIKE обслуживают триграммные индексы
+            response = await run_query(supabase.table('users')
+                .select('telegram_name, game_nick')
+                .or_(f'game_nick.ilike.%{search_text}%,telegram_name.ilike.%{search_text}%')
+                .limit(10))
             
             return response.data if response.data else []
         except Exception as e:
             logger.error(f"❌ Ошибка поиска: {e}")
             return []
 
+async def nick_writer(bot):
+    """Фоновая задача: по одному записывает ники из очереди в Supabase"""
+    while True:
+        user_data = await _write_queue.get()
+        try:
+            # Повторяем с растущей паузой: сбой сети или Supabase обычно короткий
+            for attempt in range(NICK_WRITE_RETRIES):
+                if await DatabaseManager.write_user_nick(user_data):
+                    break
+                if attempt < NICK_WRITE_RETRIES - 1:
+                    await asyncio.sleep(NICK_WRITE_BACKOFF * 2 ** attempt)
+            else:
+                await report_nick_write_failure(bot, user_data)
+        finally:
+            _write_queue.task_done()
+
+async def report_nick_write_failure(bot, user_data: dict):
+    """Ник так и не записался: убираем его из кэша и сообщаем пользователю"""
+    telegram_id = user_data['telegram_id']
+    # Не отдаем из кэша ник, которого нет в базе. Если с тех пор поставлен
+    # новый ник, он уже в очереди на запись - его не трогаем
+    _, cached = _cache_get_user(telegram_id)
+    if cached and cached['game_nick'] == user_data['game_nick']:
+        _nick_cache.pop(telegram_id, None)
+    try:
+        await bot.send_message(
+            chat_id=telegram_id,
+            text=f"❌ Не удалось сохранить ник {user_data['game_nick']}. "
+                 f"Попробуй позже или обратись к администратору."
+        )
+    except Exception as e:
+        logger.warning(f"Не удалось сообщить {telegram_id} об ошибке сохранения: {e}")
+
+# ================= ТЕКСТЫ =================
+# Статичные части сообщений собираем один раз при запуске
+_WELCOME_FOOTER = (
+    "⚙️ **Техническая информация:**\n"
+    "• База данных: Supabase\n"
+    "• Хостинг: Railway\n"
+    "• Код: GitHub\n\n"
+    "Напиши `/help` для всех команд"
+)
+
+WELCOME_HEAD = (
+    "👋 **Привет, {name}!**\n\n"
+    "Я бот для отображения игровых ников в Telegram группах.\n\n"
+)
+
+WELCOME_WITH_NICK = (
+    "✅ Твой текущий ник: **{nick}**\n\n"
+    "📝 Изменить: `/nick НовыйНик`\n"
+    "📊 Статистика: `/stats`\n"
+    "🔍 Найти игрока: `/find ник`\n\n"
+) + _WELCOME_FOOTER
+
+WELCOME_NO_NICK = (
+    "🎮 **Чтобы начать:**\n"
+    "1. Установи игровой ник: `/nick ТвойНик`\n"
+    "2. Добавь меня в группу как администратора\n"
+    "3. Пиши в группе - я подпишу твои сообщения!\n\n"
+    "📝 Пример: `/nick КрутойИгрок`\n\n"
+) + _WELCOME_FOOTER
+
+NICK_USAGE = (
+    "📝 **Установи игровой ник:**\n\n"
+    "Напиши: `/nick ТвойНик`\n\n"
+    "Примеры:\n"
+    "• `/nick ProPlayer`\n"
+    "• `/nick КрутойГеймер`\n"
+    "• `/nick Охотник23`\n\n"
+    "⚠️ **Требования:**\n"
+    "• От 2 до 32 символов\n"
+    "• Без запрещенных символов"
+)
+
+FIND_USAGE = (
+    "🔍 **Поиск игроков:**\n\n"
+    "Напиши: `/find ник_или_имя`\n\n"
+    "Примеры:\n"
+    "• `/find pro` - найдет ProPlayer, ProGamer и т.д.\n"
+    "• `/find алекс` - найдет Алексей, Александр\n"
+    "• `/find 007` - найдет по цифрам в нике"
+)
+
+HELP_TEXT = (
+    "🆘 **Доступные команды:**\n\n"
+    "`/start` - Начало работы с ботом\n"
+    "`/nick [ник]` - Установить/изменить игровой ник\n"
+    "`/mynick` - Показать текущий ник\n"
+    "`/stats` - Статистика бота и игроков\n"
+    "`/find [текст]` - Поиск игрока по нику или имени\n"
+    "`/help` - Эта справка\n\n"
+    "**📖 Как использовать:**\n"
+    "1. Установи ник через `/nick ТвойНик`\n"
+    "2. Добавь бота в группу как администратора\n"
+    "3. Дай права: удаление и отправка сообщений\n"
+    "4. Пиши в группе - бот подпишет твои сообщения!\n\n"
+    "**⚙️ Техническая информация:**\n"
+    "• База данных: Supabase (PostgreSQL)\n"
+    "• Хостинг: Railway\n"
+    "• Исходный код: GitHub\n"
+    "• Авто-бэкапы: ежедневно\n\n"
+    "**📞 Поддержка:**\n"
+    "Проблемы с ботом? Обратись к администратору."
+)
+
 # ================= КОМАНДЫ БОТА =================
+# Символы, запрещенные в нике
+_FORBIDDEN_RE = re.compile(r"[<>&\"'`\\]")
+
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Команда /start"""
     user = update.effective_user
@@ -139,34 +371,11 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Получаем текущий ник
     current_nick = await DatabaseManager.get_user_nick(user.id)
     
-    welcome_text = (
-        f"👋 **Привет, {user.first_name}!**\n\n"
-        f"Я бот для отображения игровых ников в Telegram группах.\n\n"
-    )
-    
+    welcome_text = WELCOME_HEAD.format(name=escape_markdown(user.first_name))
     if current_nick:
-        welcome_text += (
-            f"✅ Твой текущий ник: **{current_nick}**\n\n"
-            f"📝 Изменить: `/nick НовыйНик`\n"
-            f"📊 Статистика: `/stats`\n"
-            f"🔍 Найти игрока: `/find ник`\n\n"
-        )
+        welcome_text += WELCOME_WITH_NICK.format(nick=escape_markdown(current_nick))
     else:
-        welcome_text += (
-            f"🎮 **Чтобы начать:**\n"
-            f"1. Установи игровой ник: `/nick ТвойНик`\n"
-            f"2. Добавь меня в группу как администратора\n"
-            f"3. Пиши в группе - я подпишу твои сообщения!\n\n"
-            f"📝 Пример: `/nick КрутойИгрок`\n\n"
-        )
-    
-    welcome_text += (
-        f"⚙️ **Техническая информация:**\n"
-        f"• База данных: Supabase\n"
-        f"• Хостинг: Railway\n"
-        f"• Код: GitHub\n\n"
-        f"Напиши `/help` для всех команд"
-    )
+        welcome_text += WELCOME_NO_NICK
     
     await update.message.reply_text(welcome_text, parse_mode='Markdown')
 
@@ -179,24 +388,13 @@ async def nick_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         current_nick = await DatabaseManager.get_user_nick(user.id)
         if current_nick:
             await update.message.reply_text(
-                f"🎮 **Твой текущий ник:** {current_nick}\n\n"
+                f"🎮 **Твой текущий ник:** {escape_markdown(current_nick)}\n\n"
                 f"Чтобы изменить, напиши:\n"
                 f"`/nick НовыйИгровойНик`",
                 parse_mode='Markdown'
             )
         else:
-            await update.message.reply_text(
-                "📝 **Установи игровой ник:**\n\n"
-                "Напиши: `/nick ТвойНик`\n\n"
-                "Примеры:\n"
-                "• `/nick ProPlayer`\n"
-                "• `/nick КрутойГеймер`\n"
-                "• `/nick Охотник23`\n\n"
-                "⚠️ **Требования:**\n"
-                "• От 2 до 32 символов\n"
-                "• Без запрещенных символов",
-                parse_mode='Markdown'
-            )
+            await update.message.reply_text(NICK_USAGE, parse_mode='Markdown')
         return
     
     # Получаем ник из аргументов
@@ -212,64 +410,63 @@ async def nick_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     # Запрещенные символы
-    forbidden_chars = ['<', '>', '&', '"', "'", '`', '\\']
-    for char in forbidden_chars:
-        if char in game_nick:
-            await update.message.reply_text(f"❌ Ник содержит запрещенный символ: {char}")
-            return
+    forbidden = _FORBIDDEN_RE.search(game_nick)
+    if forbidden:
+        await update.message.reply_text(f"❌ Ник содержит запрещенный символ: {forbidden.group(0)}")
+        return
+    
+    # Статистику берем до сохранения: запись идет в фоне, и новый игрок
+    # может еще не попасть в общее число - тогда учитываем его сами
+    user_row = await DatabaseManager.get_user(user.id)
+    # В кэш попадает только успешный ответ базы: нет записи - база недоступна
+    user_known, _ = _cache_get_user(user.id)
+    stats = await DatabaseManager.get_stats()
+    
+    # Если хоть один запрос не удался, число игроков не показываем
+    total_text = ""
+    if user_known and stats['total'] is not None:
+        total = stats['total'] + 1 if user_row is None else stats['total']
+        total_text = f"📊 Всего игроков в базе: **{total}**\n\n"
     
-    # Сохраняем в базу данных
-    success = await DatabaseManager.save_user_nick(
+    # Сохраняем в базу данных (в фоне; об ошибке nick_writer сообщит в личку)
+    await DatabaseManager.save_user_nick(
         user.id, 
         user.username, 
         user.first_name, 
         game_nick
     )
     
-    if success:
-        # Получаем статистику
-        stats = await DatabaseManager.get_stats()
-        
-        await update.message.reply_text(
-            f"✅ **Отлично, {user.first_name}!**\n\n"
-            f"🎮 Твой игровой ник: **{game_nick}**\n\n"
-            f"📊 Всего игроков в базе: **{stats['total']}**\n\n"
-            f"**Что дальше:**\n"
-            f"1. Добавь меня в группу как администратора\n"
-            f"2. Дай права на удаление сообщений\n"
-            f"3. Пиши в группе - я подпишу твои сообщения!\n\n"
-            f"🔄 Изменить ник: `/nick НовыйНик`",
-            parse_mode='Markdown'
-        )
-    else:
-        await update.message.reply_text(
-            "❌ Не удалось сохранить ник. Попробуй позже или обратись к администратору."
-        )
+    await update.message.reply_text(
+        f"✅ **Отлично, {escape_markdown(user.first_name)}!**\n\n"
+        f"🎮 Твой игровой ник: **{escape_markdown(game_nick)}**\n\n"
+        f"{total_text}"
+        f"**Что дальше:**\n"
+        f"1. Добавь меня в группу как администратора\n"
+        f"2. Дай права на удаление сообщений\n"
+        f"3. Пиши в группе - я подпишу твои сообщения!\n\n"
+        f"🔄 Изменить ник: `/nick НовыйНик`",
+        parse_mode='Markdown'
+    )
 
 async def mynick_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Команда /mynick - показать мой ник"""
     user = update.effective_user
-    current_nick = await DatabaseManager.get_user_nick(user.id)
+    user_row = await DatabaseManager.get_user(user.id)
+    current_nick = user_row['game_nick'] if user_row else None
     
     if current_nick:
-        # Получаем дату регистрации
-        try:
-            response = supabase.table('users') \
-                .select('created_at') \
-                .eq('telegram_id', user.id) \
-                .execute()
-            
-            reg_date = ""
-            if response.data and len(response.data) > 0:
-                created = response.data[0]['created_at']
-                if created:
-                    date_obj = datetime.fromisoformat(created.replace('Z', '+00:00'))
-                    reg_date = date_obj.strftime(" (%d.%m.%Y)")
-        except:
-            reg_date = ""
+        # Дата регистрации приходит вместе с ником
+        reg_date = ""
+        created = user_row.get('created_at')
+        if created:
+            try:
+                date_obj = datetime.fromisoformat(created.replace('Z', '+00:00'))
+                reg_date = date_obj.strftime(" (%d.%m.%Y)")
+            except ValueError:
+                reg_date = ""
         
         await update.message.reply_text(
-            f"🎮 **Твой игровой ник:** {current_nick}{reg_date}\n\n"
+            f"🎮 **Твой игровой ник:** {escape_markdown(current_nick)}{reg_date}\n\n"
             f"Изменить: `/nick НовыйНик`\n"
             f"Посмотреть статистику: `/stats`",
             parse_mode='Markdown'
@@ -289,7 +486,7 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     response = (
         f"📊 **Статистика бота:**\n\n"
-        f"👥 **Всего игроков:** {stats['total']}\n"
+        f"👥 **Всего игроков:** {stats['total'] or 0}\n"
         f"🗄️ **База данных:** Supabase\n"
         f"🚂 **Хостинг:** Railway\n"
         f"💾 **Хранилище:** PostgreSQL\n\n"
@@ -298,14 +495,7 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if stats['recent']:
         response += "🆕 **Последние игроки:**\n"
         for idx, user in enumerate(stats['recent'][:5], 1):
-            # Форматируем дату
-            try:
-                date_obj = datetime.fromisoformat(user['created_at'].replace('Z', '+00:00'))
-                date_str = date_obj.strftime("%d.%m")
-            except:
-                date_str = "сегодня"
-            
-            response += f"{idx}. {user['game_nick']} ({user['telegram_name']}) - {date_str}\n"
+            response += f"{idx}. {escape_markdown(user['game_nick'])} ({escape_markdown(user['telegram_name'])}) - {user['date_str']}\n"
     
     response += "\n🔍 Найти игрока: `/find ник`"
     
@@ -314,113 +504,154 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def find_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Команда /find - поиск игрока"""
     if not context.args:
-        await update.message.reply_text(
-            "🔍 **Поиск игроков:**\n\n"
-            "Напиши: `/find ник_или_имя`\n\n"
-            "Примеры:\n"
-            "• `/find pro` - найдет ProPlayer, ProGamer и т.д.\n"
-            "• `/find алекс` - найдет Алексей, Александр\n"
-            "• `/find 007` - найдет по цифрам в нике",
-            parse_mode='Markdown'
-        )
+        await update.message.reply_text(FIND_USAGE, parse_mode='Markdown')
         return
     
     search_text = ' '.join(context.args)
     results = await DatabaseManager.search_nick(search_text)
+    safe_text = escape_markdown(search_text)
     
     if results:
-        response = f"🔍 **Найдено по запросу '{search_text}':**\n\n"
+        response = f"🔍 **Найдено по запросу '{safe_text}':**\n\n"
         for idx, user in enumerate(results[:10], 1):
-            response += f"{idx}. **{user['game_nick']}** ({user['telegram_name']})\n"
+            response += f"{idx}. **{escape_markdown(user['game_nick'])}** ({escape_markdown(user['telegram_name'])})\n"
         
         if len(results) > 10:
             response += f"\n... и еще {len(results) - 10} результатов"
     else:
-        response = f"❌ По запросу '{search_text}' ничего не найдено.\n\nПопробуй другой запрос."
+        response = f"❌ По запросу '{safe_text}' ничего не найдено.\n\nПопробуй другой запрос."
     
     await update.message.reply_text(response, parse_mode='Markdown')
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Команда /help - справка"""
-    help_text = (
-        "🆘 **Доступные команды:**\n\n"
-        "`/start` - Начало работы с ботом\n"
-        "`/nick [ник]` - Установить/изменить игровой ник\n"
-        "`/mynick` - Показать текущий ник\n"
-        "`/stats` - Статистика бота и игроков\n"
-        "`/find [текст]` - Поиск игрока по нику или имени\n"
-        "`/help` - Эта справка\n\n"
-        "**📖 Как использовать:**\n"
-        "1. Установи ник через `/nick ТвойНик`\n"
-        "2. Добавь бота в группу как администратора\n"
-        "3. Дай права: удаление и отправка сообщений\n"
-        "4. Пиши в группе - бот подпишет твои сообщения!\n\n"
-        "**⚙️ Техническая информация:**\n"
-        "• База данных: Supabase (PostgreSQL)\n"
-        "• Хостинг: Railway\n"
-        "• Исходный код: GitHub\n"
-        "• Авто-бэкапы: ежедневно\n\n"
-        "**📞 Поддержка:**\n"
-        "Проблемы с ботом? Обратись к администратору."
+    await update.message.reply_text(HELP_TEXT, parse_mode='Markdown')
+
+async def delete_message_job(context: ContextTypes.DEFAULT_TYPE):
+    """Задача JobQueue: удалить сообщение бота"""
+    job = context.job
+    try:
+        await context.bot.delete_message(chat_id=job.chat_id, message_id=job.data)
+    except Exception as e:
+        logger.warning(f"Не удалось удалить сообщение {job.data}: {e}")
+
+async def repost_with_nick(update: Update, context: ContextTypes.DEFAULT_TYPE, game_nick: str, message_text: str):
+    """Переотправить сообщение от имени ника и удалить оригинал"""
+    # Сначала отправляем сообщение с ником: если отправка не удалась
+    # (flood control, сеть, слишком длинный текст), оригинал остается в чате
+    sent_message = await context.bot.send_message(
+        chat_id=update.effective_chat.id,
+        text=f"*🎮 {escape_markdown(game_nick, 2)}:* {escape_markdown(message_text, 2)}",
+        parse_mode=ParseMode.MARKDOWN_V2
     )
     
-    await update.message.reply_text(help_text, parse_mode='Markdown')
+    # Удаляем оригинальное сообщение
+    try:
+        await update.message.delete()
+    except Exception as e:
+        logger.warning(f"Не удалось удалить сообщение {update.message.message_id}: {e}")
+        
+        # Если не удалось удалить, удаляем наше сообщение чтобы не было дубля
+        try:
+            await sent_message.delete()
+        except:
+            pass
 
-async def handle_group_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Обработка сообщений в группе"""
-    # Проверяем, что это группа
-    if update.message.chat.type not in ['group', 'supergroup']:
-        return
-    
-    # Игнорируем команды
-    if update.message.text and update.message.text.startswith('/'):
-        return
-    
+async def process_group_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Подписать сообщение ником или напомнить установить ник"""
     user = update.effective_user
-    user_id = user.id
     message_text = update.message.text or ""
     
     # Получаем ник из базы данных
-    game_nick = await DatabaseManager.get_user_nick(user_id)
+    game_nick = await DatabaseManager.get_user_nick(user.id)
     
     if game_nick:
-        # Отправляем сообщение с ником
-        sent_message = await context.bot.send_message(
-            chat_id=update.effective_chat.id,
-            text=f"**🎮 {game_nick}:** {message_text}",
-            parse_mode='Markdown'
-        )
-        
-        # Удаляем оригинальное сообщение
-        try:
-            await update.message.delete()
-        except Exception as e:
-            logger.warning(f"Не удалось удалить сообщение {update.message.message_id}: {e}")
-            
-            # Если не удалось удалить, удаляем наше сообщение чтобы не было дубля
-            try:
-                await sent_message.delete()
-            except:
-                pass
+        await repost_with_nick(update, context, game_nick, message_text)
     
     else:
         # Если у пользователя нет ника
         try:
             reminder = await update.message.reply_text(
-                f"👤 {user.first_name}, для отправки сообщений нужен игровой ник!\n\n"
+                f"👤 {escape_markdown(user.first_name)}, для отправки сообщений нужен игровой ник!\n\n"
                 f"Напиши мне в личные сообщения:\n"
                 f"`/nick ТвойИгровойНик`",
                 parse_mode='Markdown',
                 reply_to_message_id=update.message.message_id
             )
             
-            # Удаляем напоминание через 15 секунд
-            await asyncio.sleep(15)
-            await reminder.delete()
+            # Удаляем напоминание через 15 секунд, не задерживая обработчик
+            context.job_queue.run_once(
+                delete_message_job,
+                when=REMINDER_TTL,
+                chat_id=reminder.chat_id,
+                data=reminder.message_id,
+                name=f"del_{reminder.message_id}"
+            )
             
         except Exception as e:
             logger.error(f"Ошибка напоминания: {e}")
 
+async def handle_group_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработка сообщений в группе"""
+    # Проверяем, что это группа
+    if update.message.chat.type not in ['group', 'supergroup']:
+        return
+    
+    # Игнорируем команды
+    if update.message.text and update.message.text.startswith('/'):
+        return
+    
+    chat_id = update.effective_chat.id
+    _chat_pending[chat_id] += 1
+    try:
+        # Чат не успевает - один раз за всплеск сообщаем, что сообщения в очереди.
+        # Одно сообщение обрабатывается, остальные ждут блокировку чата.
+        # Уведомление шлем в фоне: ожидание здесь пустило бы следующие
+        # сообщения к блокировке раньше этого и нарушило бы порядок
+        waiting = _chat_pending[chat_id] - 1
+        if waiting > CHAT_QUEUE_THRESHOLD and chat_id not in _busy_notices:
+            _busy_notices[chat_id] = asyncio.create_task(context.bot.send_message(
+                chat_id=chat_id,
+                text="⏳ Много сообщений, обрабатываю..."
+            ))
+        
+        # Сообщения одного чата - строго по очереди, начиная с поиска ника,
+        # иначе переотправленные сообщения перемешаются. Разные чаты - параллельно
+        async with _chat_locks[chat_id]:
+            await process_group_message(update, context)
+    finally:
+        _chat_pending[chat_id] -= 1
+        if not _chat_pending[chat_id]:
+            # Всплеск закончился - убираем состояние чата и уведомление
+            del _chat_pending[chat_id]
+            _chat_locks.pop(chat_id, None)
+            notice_task = _busy_notices.pop(chat_id, None)
+            if notice_task:
+                try:
+                    notice = await notice_task
+                    await notice.delete()
+                except Exception as e:
+                    logger.warning(f"Не удалось убрать уведомление о нагрузке: {e}")
+
+async def handle_bot_added(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Бота добавили в группу или сделали админом - заранее грузим ники в кэш"""
+    member_update = update.my_chat_member
+    if member_update.chat.type not in ['group', 'supergroup']:
+        return
+    
+    old_status = member_update.old_chat_member.status
+    new_status = member_update.new_chat_member.status
+    if new_status == old_status or new_status not in ['member', 'administrator']:
+        return
+    
+    try:
+        admins = await context.bot.get_chat_administrators(member_update.chat.id)
+    except Exception as e:
+        logger.warning(f"Не удалось получить администраторов чата {member_update.chat.id}: {e}")
+        return
+    
+    await DatabaseManager.prefetch_nicks([m.user.id for m in admins if not m.user.is_bot])
+
 async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик ошибок"""
     logger.error(f"Ошибка при обработке обновления: {context.error}")
@@ -436,6 +667,18 @@ async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             pass
 
 # ================= ЗАПУСК БОТА =================
+async def post_init(application: Application):
+    """Запуск фоновых задач после инициализации бота"""
+    # Храним ссылку на задачу, чтобы ее не собрал сборщик мусора
+    application.bot_data['nick_writer'] = asyncio.create_task(nick_writer(application.bot))
+
+async def post_shutdown(application: Application):
+    """Дожидаемся записи ников, оставшихся в очереди"""
+    try:
+        await asyncio.wait_for(_write_queue.join(), timeout=10)
+    except asyncio.TimeoutError:
+        logger.warning(f"⚠️ Не записано ников при остановке: {_write_queue.qsize()}")
+
 def main():
     """Основная функция запуска"""
     logger.info("=" * 50)
@@ -449,7 +692,12 @@ def main():
         return
     
     # Создаем приложение бота
-    application = Application.builder().token(BOT_TOKEN).build()
+    application = Application.builder() \
+        .token(BOT_TOKEN) \
+        .concurrent_updates(CONCURRENT_UPDATES) \
+        .post_init(post_init) \
+        .post_shutdown(post_shutdown) \
+        .build()
     
     # Регистрируем команды
     commands = [
@@ -465,11 +713,17 @@ def main():
         application.add_handler(CommandHandler(cmd_name, cmd_handler))
     
     # Обработчик сообщений в группах
+    # block=False: сообщение, ждущее блокировку своего чата, не занимает
+    # слот concurrent_updates, и занятая группа не тормозит остальные чаты
     application.add_handler(MessageHandler(
         filters.TEXT & ~filters.COMMAND & filters.ChatType.GROUPS,
-        handle_group_message
+        handle_group_message,
+        block=False
     ))
     
+    # Бота добавили в группу - прогреваем кэш ников
+    application.add_handler(ChatMemberHandler(handle_bot_added, ChatMemberHandler.MY_CHAT_MEMBER))
+    
     # Обработчик для личных сообщений (не команды)
     async def handle_private_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(
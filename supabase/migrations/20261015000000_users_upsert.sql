@@ -0,0 +1,13 @@
+-- save_user_nick делает upsert по telegram_id и не передает created_at:
+-- нужен уникальный индекс для ON CONFLICT и DEFAULT для даты регистрации
+
+-- Старый код (проверка + insert) мог из-за гонки создать дубли telegram_id,
+-- и тогда уникальный индекс не создастся. Оставляем самую свежую запись
+DELETE FROM users u
+USING users newer
+WHERE u.telegram_id = newer.telegram_id
+  AND (coalesce(u.updated_at, u.created_at, '-infinity'), u.ctid)
+    < (coalesce(newer.updated_at, newer.created_at, '-infinity'), newer.ctid);
+
+CREATE UNIQUE INDEX IF NOT EXISTS users_telegram_id_key ON users (telegram_id);
+ALTER TABLE users ALTER COLUMN created_at SET DEFAULT now();
@@ -0,0 +1,19 @@
+-- Статистика для /stats одним запросом: общее число игроков и 5 последних
+CREATE OR REPLACE FUNCTION get_user_stats()
+RETURNS json
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT json_build_object(
+        'total', (SELECT count(*) FROM users),
+        'recent', coalesce(
+            (SELECT json_agg(u) FROM (
+                SELECT telegram_name, game_nick, created_at
+                FROM users
+                ORDER BY created_at DESC
+                LIMIT 5
+            ) u),
+            '[]'::json
+        )
+    );
+$$;
@@ -0,0 +1,21 @@
+-- /find ищет по game_nick ILIKE '%x%' OR telegram_name ILIKE '%x%':
+-- без триграммных индексов это полный просмотр таблицы
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS users_game_nick_trgm
+    ON users USING gin (game_nick gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS users_telegram_name_trgm
+    ON users USING gin (telegram_name gin_trgm_ops);
+
+-- Поиск ника по telegram_id идет на каждое сообщение в группе:
+-- делаем telegram_id первичным ключом, если ключа у таблицы еще нет
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conrelid = 'users'::regclass AND contype = 'p'
+    ) THEN
+        ALTER TABLE users
+            ADD CONSTRAINT users_pkey PRIMARY KEY USING INDEX users_telegram_id_key;
+    END IF;
+END $$;